@@ -9,22 +9,28 @@ Usage:
 
 import os
 import math
+import hashlib
 import random
 import multiprocessing
 import numpy as np
+from scipy.ndimage import gaussian_filter1d
 import tensorflow as tf
 from tensorflow import keras
-from sklearn.model_selection import train_test_split
 from sklearn.metrics import confusion_matrix, classification_report
 
 # ─── Config ──────────────────────────────────────────────────────────────────
 
 CANVAS_SIZE = 48
 NUM_CLASSES = 10
-SAMPLES_PER_CLASS = 10_000  # was 4,000 → 100,000 total
-BATCH_SIZE = 64  # was 32 — better throughput on Apple Silicon
+SAMPLES_PER_CLASS = 10_000  # was 4,000 → 100,000 total; training samples are regenerated every epoch
+VAL_SAMPLES_PER_CLASS = 1_000  # fixed validation set, generated once and cached
+TF_RESERVED_CORES = 2  # cores left to TensorFlow while workers augment during training
+BATCH_SIZE = 64  # per replica; was 32 — better throughput on Apple Silicon
+LEARNING_RATE = 0.001  # per replica; scaled linearly with the replica count
 MAX_EPOCHS = 100
 STROKE_WIDTH = 1.5
+QUANTIZATION_MAX_DROP = 0.005  # max validation accuracy lost to uint8 kernels before exporting float32
+FOLD_TOLERANCE = 1e-2  # max probability difference allowed between the BN-folded and trained model
 
 SHAPE_NAMES = [
     "circle",
@@ -60,49 +66,46 @@ EXPORT_PATH = os.path.join(
     os.path.dirname(__file__), "..", "frontend", "public", "models", "shape-recognizer"
 )
 
+# Generated datasets are cached here, keyed on the sizes and a hash of this script
+DATASET_CACHE_DIR = os.path.join(os.path.dirname(__file__), "dataset_cache")
+
 
 # ─── Geometry helpers ────────────────────────────────────────────────────────
 
 
+# Point sequences are (N, 2) float32 arrays throughout the pipeline.
+
+
 def lerp_points(p1, p2, n):
     """Linearly interpolate n points between p1 and p2."""
-    pts = []
-    for i in range(n):
-        t = i / max(n - 1, 1)
-        pts.append((p1[0] + t * (p2[0] - p1[0]), p1[1] + t * (p2[1] - p1[1])))
-    return pts
+    p1 = np.asarray(p1, dtype=np.float32)
+    p2 = np.asarray(p2, dtype=np.float32)
+    t = np.linspace(0, 1, n, dtype=np.float32)[:, np.newaxis]
+    return p1 + t * (p2 - p1)
 
 
 def path_length(points):
     """Total euclidean path length."""
-    total = 0
-    for i in range(1, len(points)):
-        dx = points[i][0] - points[i - 1][0]
-        dy = points[i][1] - points[i - 1][1]
-        total += math.sqrt(dx * dx + dy * dy)
-    return total
+    return float(np.linalg.norm(np.diff(points, axis=0), axis=1).sum())
 
 
 def interpolate_along_edges(vertices, total_points):
-    """Distribute points evenly along polygon edges."""
-    edges = []
-    for i in range(len(vertices) - 1):
-        edges.append((vertices[i], vertices[i + 1]))
-
-    edge_lengths = []
-    for a, b in edges:
-        edge_lengths.append(math.sqrt((b[0] - a[0]) ** 2 + (b[1] - a[1]) ** 2))
+    """Distribute exactly total_points points evenly (by arc length) along polygon edges."""
+    verts = np.asarray(vertices, dtype=np.float32)
+    edge_lengths = np.linalg.norm(np.diff(verts, axis=0), axis=1)
+    arc = np.concatenate([[0.0], np.cumsum(edge_lengths)])
 
-    total_len = sum(edge_lengths)
+    total_len = arc[-1]
     if total_len == 0:
-        return [vertices[0]] * total_points
+        return np.repeat(verts[:1], total_points, axis=0)
 
-    points = []
-    for (a, b), elen in zip(edges, edge_lengths):
-        n = max(2, int(round(total_points * elen / total_len)))
-        points.extend(lerp_points(a, b, n))
+    u = np.linspace(0, total_len, total_points)
+    # Snap the nearest sample onto each vertex so corners stay sharp
+    u[np.rint(arc / total_len * (total_points - 1)).astype(np.int64)] = arc
 
-    return points[:total_points]
+    x = np.interp(u, arc, verts[:, 0])
+    y = np.interp(u, arc, verts[:, 1])
+    return np.stack([x, y], axis=1).astype(np.float32)
 
 
 # ─── Hand-drawing simulation ────────────────────────────────────────────────
@@ -114,39 +117,27 @@ def add_hand_wobble(points, intensity=1.5):
     if n < 2:
         return points
 
-    result = []
     freq1 = random.uniform(0.05, 0.15)
     freq2 = random.uniform(0.2, 0.4)
     phase1 = random.uniform(0, 2 * math.pi)
     phase2 = random.uniform(0, 2 * math.pi)
 
-    for i, (x, y) in enumerate(points):
-        t = i / max(n - 1, 1)
-
-        # Normal direction (perpendicular to stroke direction)
-        if i == 0:
-            dx = points[1][0] - points[0][0]
-            dy = points[1][1] - points[0][1]
-        elif i == n - 1:
-            dx = points[-1][0] - points[-2][0]
-            dy = points[-1][1] - points[-2][1]
-        else:
-            dx = points[i + 1][0] - points[i - 1][0]
-            dy = points[i + 1][1] - points[i - 1][1]
-
-        mag = math.sqrt(dx * dx + dy * dy) + 1e-8
-        nx, ny = -dy / mag, dx / mag
-
-        # Low-frequency drift + high-frequency tremor
-        wobble = (
-            math.sin(t * n * freq1 + phase1) * intensity * 0.6
-            + math.sin(t * n * freq2 + phase2) * intensity * 0.3
-            + random.gauss(0, intensity * 0.3)
-        )
+    # Normal direction (perpendicular to stroke direction), central differences inside
+    d = np.empty_like(points)
+    d[1:-1] = points[2:] - points[:-2]
+    d[0] = points[1] - points[0]
+    d[-1] = points[-1] - points[-2]
+    mag = np.hypot(d[:, 0], d[:, 1]) + 1e-8
+    normals = np.stack([-d[:, 1] / mag, d[:, 0] / mag], axis=1)
 
-        result.append((x + nx * wobble, y + ny * wobble))
+    # Low-frequency drift + high-frequency tremor over one shared t * n table,
+    # accumulated in place in float32
+    tn = np.arange(n, dtype=np.float32) * np.float32(n / max(n - 1, 1))
+    wobble = np.sin(tn * freq1 + phase1) * (intensity * 0.6)
+    wobble += np.sin(tn * freq2 + phase2) * (intensity * 0.3)
+    wobble += np.random.normal(0, intensity * 0.3, n)
 
-    return result
+    return points + normals * wobble[:, np.newaxis]
 
 
 def simulate_incomplete_shape(points, is_closed):
@@ -165,34 +156,23 @@ def simulate_stroke_speed(points):
     if len(points) < 5:
         return points
 
-    # Calculate curvature at each point
-    curvatures = [0.0]
-    for i in range(1, len(points) - 1):
-        ax, ay = points[i - 1]
-        bx, by = points[i]
-        cx, cy = points[i + 1]
-
-        v1x, v1y = bx - ax, by - ay
-        v2x, v2y = cx - bx, cy - by
-
-        cross = abs(v1x * v2y - v1y * v2x)
-        dot = v1x * v2x + v1y * v2y
-        angle = math.atan2(cross, dot + 1e-8)
-        curvatures.append(angle)
-    curvatures.append(0.0)
-
-    # Resample: keep more points where curvature is high
-    result = [points[0]]
-    for i in range(1, len(points)):
-        # Higher curvature = always keep; lower curvature = randomly skip
-        keep_prob = 0.3 + 0.7 * min(curvatures[i] / 0.5, 1.0)
-        if random.random() < keep_prob:
-            result.append(points[i])
-
-    if len(result) < 3:
+    # Turning angle at each interior point, via |sin| = |cross| / (|v1| |v2|) instead of atan2.
+    # Past 90° (negative dot) the angle is above the 0.5 rad cap anyway.
+    v1 = points[1:-1] - points[:-2]
+    v2 = points[2:] - points[1:-1]
+    cross = np.abs(v1[:, 0] * v2[:, 1] - v1[:, 1] * v2[:, 0])
+    dot = (v1 * v2).sum(axis=1)
+    sin_a = cross / (np.hypot(v1[:, 0], v1[:, 1]) * np.hypot(v2[:, 0], v2[:, 1]) + 1e-8)
+    sharpness = np.where(dot < 0, 1.0, np.minimum(sin_a / math.sin(0.5), 1.0))
+
+    # Higher curvature = always keep; lower curvature = randomly skip.
+    # The first point is always kept; the last has no curvature and gets the base rate.
+    keep_prob = 0.3 + 0.7 * np.concatenate([sharpness, [0.0]])
+    keep = np.concatenate([[True], np.random.random(len(points) - 1) < keep_prob])
+    if keep.sum() < 3:
         return points
 
-    return result
+    return points[keep]
 
 
 def elastic_deform(points, alpha=4.0, sigma=3.0):
@@ -202,22 +182,12 @@ def elastic_deform(points, alpha=4.0, sigma=3.0):
 
     n = len(points)
     # Generate random displacement field
-    dx_field = np.random.randn(n) * alpha
-    dy_field = np.random.randn(n) * alpha
+    field = np.random.randn(n, 2).astype(np.float32) * alpha
 
-    # Smooth with gaussian kernel
-    kernel_size = max(3, int(sigma * 2) | 1)
-    kernel = np.exp(-0.5 * np.linspace(-2, 2, kernel_size) ** 2)
-    kernel /= kernel.sum()
+    # Smooth with a gaussian spanning ±2 std over ~2 * sigma points
+    field = gaussian_filter1d(field, sigma=sigma / 2, axis=0, mode="nearest", truncate=2.0)
 
-    dx_field = np.convolve(dx_field, kernel, mode="same")
-    dy_field = np.convolve(dy_field, kernel, mode="same")
-
-    result = []
-    for i, (x, y) in enumerate(points):
-        result.append((x + dx_field[i], y + dy_field[i]))
-
-    return result
+    return points + field
 
 
 # ─── Shape generators ───────────────────────────────────────────────────────
@@ -230,17 +200,14 @@ def generate_circle():
     num_points = random.randint(50, 80)
     start_angle = random.uniform(0, 2 * math.pi)
 
-    points = []
-    for i in range(num_points + 1):
-        theta = start_angle + (i / num_points) * 2 * math.pi
-        r = base_r * (1 + random.uniform(-0.08, 0.08))
-        rx = r * eccentricity
-        ry = r / eccentricity
-        x = cx + rx * math.cos(theta)
-        y = cy + ry * math.sin(theta)
-        points.append((x, y))
+    theta = start_angle + np.arange(num_points + 1) / num_points * 2 * math.pi
+    r = base_r * (1 + np.random.uniform(-0.08, 0.08, num_points + 1))
+    rx = r * eccentricity
+    ry = r / eccentricity
 
-    return points
+    return np.stack([cx + rx * np.cos(theta), cy + ry * np.sin(theta)], axis=1).astype(
+        np.float32
+    )
 
 
 def generate_square():
@@ -331,19 +298,11 @@ def _generate_arrow(direction):
         tip = (cx, cy + length / 2)
         shaft_dir = (0, 1)
 
-    # Generate shaft with curvature
-    points = []
-    for i in range(shaft_points):
-        t = i / (shaft_points - 1)
-        x = start[0] + t * (tip[0] - start[0])
-        y = start[1] + t * (tip[1] - start[1])
-        # Add perpendicular curvature
-        perp_x = -shaft_dir[1]
-        perp_y = shaft_dir[0]
-        curve_offset = curvature * math.sin(t * math.pi)
-        x += perp_x * curve_offset
-        y += perp_y * curve_offset
-        points.append((x, y))
+    # Generate shaft with perpendicular curvature
+    shaft = lerp_points(start, tip, shaft_points)
+    t = np.linspace(0, 1, shaft_points, dtype=np.float32)
+    curve_offset = curvature * np.sin(t * math.pi)
+    shaft += np.outer(curve_offset, (-shaft_dir[1], shaft_dir[0])).astype(np.float32)
 
     # Arrowhead
     tx, ty = tip
@@ -359,11 +318,9 @@ def _generate_arrow(direction):
         ty - head_size * math.sin(angle + head_angle),
     )
 
-    points.append(wing1)
-    points.append(tip)
-    points.append(wing2)
+    head = np.array([wing1, tip, wing2], dtype=np.float32)
 
-    return points
+    return np.concatenate([shaft, head])
 
 
 def generate_arrow_left():
@@ -416,18 +373,12 @@ def generate_line():
     num_points = random.randint(20, 40)
     curvature = random.uniform(-2, 2)
 
-    points = []
-    for i in range(num_points):
-        t = i / (num_points - 1)
-        x = x1 + t * (x2 - x1)
-        y = y1 + t * (y2 - y1)
-        # Slight curvature
-        perp_x = -(y2 - y1) / (length + 1e-8)
-        perp_y = (x2 - x1) / (length + 1e-8)
-        offset = curvature * math.sin(t * math.pi)
-        x += perp_x * offset
-        y += perp_y * offset
-        points.append((x, y))
+    points = lerp_points((x1, y1), (x2, y2), num_points)
+
+    # Slight curvature
+    perp = np.array([-(y2 - y1), x2 - x1], dtype=np.float32) / (length + 1e-8)
+    t = np.linspace(0, 1, num_points, dtype=np.float32)
+    points += np.outer(curvature * np.sin(t * math.pi), perp).astype(np.float32)
 
     return points
 
@@ -450,8 +401,9 @@ GENERATORS = {
 
 
 def augment(points, shape_name):
-    """Apply full augmentation pipeline."""
+    """Apply full augmentation pipeline. Returns an (N, 2) float32 array."""
 
+    points = np.asarray(points, dtype=np.float32)
     is_closed = shape_name in CLOSED_SHAPES
     rot_min, rot_max = ROTATION_RANGES[shape_name]
 
@@ -471,18 +423,20 @@ def augment(points, shape_name):
         alpha = random.uniform(2.0, 6.0)
         points = elastic_deform(points, alpha=alpha, sigma=3.0)
 
-    # 5. Rotation
+    # 5-7. Rotation and scale about the centroid, then translation — one affine pass
     angle_deg = random.uniform(rot_min, rot_max)
-    points = rotate(points, math.radians(angle_deg))
-
-    # 6. Scale
     scale_factor = random.uniform(0.6, 1.8)
-    points = scale(points, scale_factor)
-
-    # 7. Translation
     tx = random.uniform(-8, 8)
     ty = random.uniform(-8, 8)
-    points = translate(points, tx, ty)
+
+    cx, cy = points.mean(axis=0)
+    transform = (
+        translation(cx + tx, cy + ty)
+        @ rotation(math.radians(angle_deg))
+        @ scaling(scale_factor)
+        @ translation(-cx, -cy)
+    )
+    points = apply_affine(points, transform)
 
     # 8. Gaussian noise on each point
     noise_std = random.uniform(0.3, 1.5)
@@ -491,28 +445,29 @@ def augment(points, shape_name):
     return points
 
 
-def rotate(points, angle):
-    cx = sum(p[0] for p in points) / len(points)
-    cy = sum(p[1] for p in points) / len(points)
+def rotation(angle):
     cos_a, sin_a = math.cos(angle), math.sin(angle)
-    return [
-        (cx + (x - cx) * cos_a - (y - cy) * sin_a, cy + (x - cx) * sin_a + (y - cy) * cos_a)
-        for x, y in points
-    ]
+    return np.array([[cos_a, -sin_a, 0], [sin_a, cos_a, 0], [0, 0, 1]], dtype=np.float32)
+
+
+def scaling(factor):
+    return np.array([[factor, 0, 0], [0, factor, 0], [0, 0, 1]], dtype=np.float32)
 
 
-def scale(points, factor):
-    cx = sum(p[0] for p in points) / len(points)
-    cy = sum(p[1] for p in points) / len(points)
-    return [(cx + (x - cx) * factor, cy + (y - cy) * factor) for x, y in points]
+def translation(dx, dy):
+    return np.array([[1, 0, dx], [0, 1, dy], [0, 0, 1]], dtype=np.float32)
 
 
-def translate(points, dx, dy):
-    return [(x + dx, y + dy) for x, y in points]
+def apply_affine(points, matrix):
+    """Apply a 3x3 homogeneous transform to (N, 2) points without building (N, 3) coordinates."""
+    return points @ matrix[:2, :2].T + matrix[:2, 2]
 
 
 def add_noise(points, std):
-    return [(x + random.gauss(0, std), y + random.gauss(0, std)) for x, y in points]
+    """Jitter every coordinate with one batched Gaussian draw."""
+    result = points.copy()
+    result += np.random.normal(0, std, points.shape)  # cast in place, no float32 temporary
+    return result
 
 
 # ─── Rasterization ──────────────────────────────────────────────────────────
@@ -520,15 +475,12 @@ def add_noise(points, std):
 
 def normalize_points(points, size):
     """Normalize points to fit in a size x size canvas with padding."""
-    xs = [p[0] for p in points]
-    ys = [p[1] for p in points]
-    min_x, max_x = min(xs), max(xs)
-    min_y, max_y = min(ys), max(ys)
-    w = max_x - min_x
-    h = max_y - min_y
+    points = np.asarray(points, dtype=np.float32)
+    mins = points.min(axis=0)
+    w, h = points.max(axis=0) - mins
 
     if w == 0 and h == 0:
-        return [(size / 2, size / 2)]
+        return np.full((1, 2), size / 2, dtype=np.float32)
 
     padding = size * 0.1
     s = (size - 2 * padding) / max(w, h, 1e-8)
@@ -536,34 +488,51 @@ def normalize_points(points, size):
     offset_x = (size - w * s) / 2
     offset_y = (size - h * s) / 2
 
-    return [((x - min_x) * s + offset_x, (y - min_y) * s + offset_y) for x, y in points]
+    return (points - mins) * s + np.array([offset_x, offset_y], dtype=np.float32)
+
+
+def _stroke_stamp(stroke_width):
+    """Pixel offsets (dy, dx) of the disk drawn at each stroke step."""
+    r = int(stroke_width) + 1
+    ys, xs = np.mgrid[-r : r + 1, -r : r + 1]
+    mask = xs * xs + ys * ys <= stroke_width * stroke_width
+    return np.stack([ys[mask], xs[mask]], axis=1)
+
+
+# Built once at import; only a non-default stroke width pays for a new one
+_STAMP = _stroke_stamp(STROKE_WIDTH)
 
 
 def rasterize(points, size, stroke_width=STROKE_WIDTH):
-    """Rasterize a list of points to a size x size grayscale image."""
-    img = np.zeros((size, size), dtype=np.float32)
+    """Rasterize a list of points to a size x size uint8 image (0 or 255)."""
+    img = np.zeros((size, size), dtype=np.uint8)
     norm = normalize_points(points, size)
 
-    for i in range(1, len(norm)):
-        x1, y1 = norm[i - 1]
-        x2, y2 = norm[i]
-        dx, dy = x2 - x1, y2 - y1
-        steps = max(int(math.sqrt(dx * dx + dy * dy) * 2), 1)
-
-        for s in range(steps + 1):
-            t = s / steps
-            cx = x1 + t * dx
-            cy = y1 + t * dy
-
-            # Draw circle at each step for consistent width
-            for wx in range(int(-stroke_width - 1), int(stroke_width + 2)):
-                for wy in range(int(-stroke_width - 1), int(stroke_width + 2)):
-                    dist = math.sqrt(wx * wx + wy * wy)
-                    if dist <= stroke_width:
-                        px = int(round(cx + wx))
-                        py = int(round(cy + wy))
-                        if 0 <= px < size and 0 <= py < size:
-                            img[py, px] = 1.0
+    if len(norm) < 2:
+        return img
+
+    # Sample every segment at ~2 steps per pixel, all segments at once
+    starts = norm[:-1]
+    deltas = norm[1:] - norm[:-1]
+    steps = np.maximum((np.hypot(deltas[:, 0], deltas[:, 1]) * 2).astype(np.int64), 1)
+    seg = np.repeat(np.arange(len(steps)), steps + 1)
+    first = np.cumsum(steps + 1) - (steps + 1)
+    t = (np.arange(len(seg)) - first[seg]) / steps[seg]
+    centers = np.rint(starts[seg] + t[:, None] * deltas[seg]).astype(np.int64)
+
+    # Mark step centers on a canvas padded by the stamp radius
+    stamp = _STAMP if stroke_width == STROKE_WIDTH else _stroke_stamp(stroke_width)
+    r = int(stroke_width) + 1
+    centers += r
+    inside = (centers >= 0).all(axis=1) & (centers < size + 2 * r).all(axis=1)
+    marks = np.zeros((size + 2 * r, size + 2 * r), dtype=bool)
+    marks[centers[inside, 1], centers[inside, 0]] = True
+
+    # Draw a disk at each center for consistent width: one shifted slice per stamp pixel
+    hit = np.zeros((size, size), dtype=bool)
+    for dy, dx in stamp:
+        hit |= marks[r - dy : r - dy + size, r - dx : r - dx + size]
+    img[hit] = 255
 
     return img
 
@@ -571,42 +540,93 @@ def rasterize(points, size, stroke_width=STROKE_WIDTH):
 # ─── Dataset generation ─────────────────────────────────────────────────────
 
 
-def _generate_class(args):
-    """Generate samples for a single class — runs in a worker process."""
-    class_idx, shape_name, count = args
-    gen_fn = GENERATORS[shape_name]
-    imgs, lbls = [], []
-    for _ in range(count):
-        points = gen_fn()
-        points = augment(points, shape_name)
-        img = rasterize(points, CANVAS_SIZE)
-        imgs.append(img)
-        lbls.append(class_idx)
-    print(f"  [{class_idx + 1}/{NUM_CLASSES}] {shape_name} done ({count} samples)")
-    return imgs, lbls
-
-
-def generate_dataset():
-    """Generate full training dataset using all CPU cores."""
-    total = SAMPLES_PER_CLASS * NUM_CLASSES
+def _init_worker():
+    """Reseed each worker so forked processes don't replay the same random stream."""
+    seed = os.getpid()
+    random.seed(seed)
+    np.random.seed(seed)
+
+
+def _make_one(class_idx):
+    """Generate one augmented, rasterized sample — runs in a worker process."""
+    shape_name = SHAPE_NAMES[class_idx]
+    points = GENERATORS[shape_name]()
+    points = augment(points, shape_name)
+    return rasterize(points, CANVAS_SIZE)
+
+
+def _save_npy(path, array):
+    """Write via a temp file so an interrupted run never leaves a truncated cache entry."""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        np.save(f, array)
+    os.replace(tmp_path, path)
+
+
+def generate_dataset(samples_per_class=SAMPLES_PER_CLASS):
+    """Generate a fixed dataset using all CPU cores, or load it from the disk cache."""
+    # Any edit to the generators or augmentation changes the hash, so stale data is never reused
+    with open(__file__, "rb") as f:
+        code_hash = hashlib.sha1(f.read()).hexdigest()[:10]
+    cache_key = f"{samples_per_class}x{NUM_CLASSES}_{CANVAS_SIZE}px_w{STROKE_WIDTH}_{code_hash}"
+    images_path = os.path.join(DATASET_CACHE_DIR, f"images_{cache_key}.npy")
+    labels_path = os.path.join(DATASET_CACHE_DIR, f"labels_{cache_key}.npy")
+    if os.path.exists(images_path) and os.path.exists(labels_path):
+        print(f"Loading cached dataset from {DATASET_CACHE_DIR}")
+        images = np.load(images_path)
+        labels = np.load(labels_path)
+        print(f"Dataset: {images.shape[0]} images, shape {images.shape[1:]}")
+        return images, labels
+
+    total = samples_per_class * NUM_CLASSES
     cores = multiprocessing.cpu_count()
-    print(f"Generating {total} samples ({SAMPLES_PER_CLASS}/class) across {cores} cores...")
+    print(f"Generating {total} samples ({samples_per_class}/class) across {cores} cores...")
+
+    labels = np.repeat(np.arange(NUM_CLASSES), samples_per_class)
+    # uint8 is 4x smaller than float32; pixels are rescaled to [0, 1] in the input pipeline
+    images = np.empty((total, CANVAS_SIZE, CANVAS_SIZE, 1), dtype=np.uint8)
 
-    args = [(i, name, SAMPLES_PER_CLASS) for i, name in enumerate(SHAPE_NAMES)]
-    with multiprocessing.Pool(processes=cores) as pool:
-        results = pool.map(_generate_class, args)
+    with multiprocessing.Pool(processes=cores, initializer=_init_worker) as pool:
+        for i, img in enumerate(pool.imap(_make_one, labels.tolist(), chunksize=64)):
+            images[i, ..., 0] = img
+            if (i + 1) % samples_per_class == 0:
+                class_idx = i // samples_per_class
+                print(f"  [{class_idx + 1}/{NUM_CLASSES}] {SHAPE_NAMES[class_idx]} done")
 
-    images = np.concatenate([np.array(r[0]) for r in results])[..., np.newaxis]
-    labels = np.concatenate([np.array(r[1]) for r in results])
+    os.makedirs(DATASET_CACHE_DIR, exist_ok=True)
+    _save_npy(labels_path, labels)
+    _save_npy(images_path, images)
 
     print(f"Dataset: {images.shape[0]} images, shape {images.shape[1:]}")
     return images, labels
 
 
+def stream_samples(pool, samples_per_epoch, block_size=4096):
+    """Endless stream of freshly augmented (image, label) pairs.
+
+    Labels come from back-to-back class-balanced permutations of samples_per_epoch samples.
+    Keras epochs (steps_per_epoch whole batches) don't line up with these exactly, so each
+    epoch is only approximately balanced.
+    """
+    per_class = samples_per_epoch // NUM_CLASSES
+    while True:
+        labels = np.random.permutation(np.repeat(np.arange(NUM_CLASSES), per_class))
+        # Submit a block at a time so finished images never pile up far ahead of training
+        for start in range(0, len(labels), block_size):
+            block = labels[start : start + block_size].tolist()
+            for label, img in zip(block, pool.imap(_make_one, block, chunksize=64)):
+                yield img[..., np.newaxis], label
+
+
 # ─── Model ───────────────────────────────────────────────────────────────────
 
 
-def create_model():
+def xla_available():
+    """XLA works on CPU and CUDA GPUs; the Apple Metal plugin has no XLA support."""
+    return tf.test.is_built_with_cuda() or not tf.config.list_physical_devices("GPU")
+
+
+def create_model(learning_rate=LEARNING_RATE):
     """Create the CNN model."""
     model = keras.Sequential(
         [
@@ -632,14 +652,19 @@ def create_model():
             keras.layers.Dropout(0.4, name="dropout1"),
             keras.layers.Dense(64, activation="relu", name="dense1"),
             keras.layers.Dropout(0.3, name="dropout2"),
-            keras.layers.Dense(NUM_CLASSES, activation="softmax", name="output"),
+            # Softmax stays float32 under mixed precision for numerical stability
+            keras.layers.Dense(
+                NUM_CLASSES, activation="softmax", name="output", dtype="float32"
+            ),
         ]
     )
 
     model.compile(
-        optimizer=keras.optimizers.Adam(learning_rate=0.001),
+        optimizer=keras.optimizers.Adam(learning_rate=learning_rate),
         loss="sparse_categorical_crossentropy",
         metrics=["accuracy"],
+        # Fuse the Conv+BN+ReLU+Pool chain into a few kernels per step
+        jit_compile=xla_available(),
     )
 
     return model
@@ -648,8 +673,71 @@ def create_model():
 # ─── TF.js Export ────────────────────────────────────────────────────────────
 
 
-def export_to_tfjs(model, output_dir):
-    """Manual export to TF.js layers-model format (Keras 2 compatible)."""
+def fold_batch_norm(model):
+    """Return an inference copy of the model with each BatchNormalization folded into its Conv2D."""
+    layers, layer_weights = [], []
+    src = model.layers
+    i = 0
+    while i < len(src):
+        layer = src[i]
+        config = layer.get_config()
+        config["dtype"] = "float32"
+        config.pop("batch_input_shape", None)
+        weights = layer.get_weights()
+
+        bn = src[i + 1] if i + 1 < len(src) else None
+        if isinstance(layer, keras.layers.Conv2D) and isinstance(
+            bn, keras.layers.BatchNormalization
+        ):
+            gamma, beta, mean, var = bn.get_weights()
+            factor = gamma / np.sqrt(var + bn.epsilon)
+            kernel = weights[0]
+            bias = weights[1] if layer.use_bias else np.zeros(layer.filters, dtype=np.float32)
+            weights = [kernel * factor, (bias - mean) * factor + beta]
+            config["use_bias"] = True
+            i += 1  # the BN layer is absorbed
+
+        layers.append(layer.__class__.from_config(config))
+        layer_weights.append(weights)
+        i += 1
+
+    folded = keras.Sequential(
+        [keras.Input(shape=(CANVAS_SIZE, CANVAS_SIZE, 1)), *layers], name=model.name
+    )
+    for layer, weights in zip(layers, layer_weights):
+        if weights:
+            layer.set_weights(weights)
+
+    return folded
+
+
+def quantize_uint8(w):
+    """Affine-quantize a float32 tensor to uint8 the way TF.js dequantizes it (q * scale + min)."""
+    w_min = float(w.min())
+    scale = (float(w.max()) - w_min) / 255 or 1.0
+    q = np.clip(np.rint((w - w_min) / scale), 0, 255).astype(np.uint8)
+    return q, {"dtype": "uint8", "scale": scale, "min": w_min}
+
+
+def dequantized_copy(model):
+    """Copy of the model with Conv2D/Dense kernels round-tripped through uint8, as TF.js loads them."""
+    copy = keras.models.clone_model(model)
+    copy.set_weights(model.get_weights())
+    for layer in copy.layers:
+        if isinstance(layer, (keras.layers.Conv2D, keras.layers.Dense)):
+            weights = layer.get_weights()
+            q, quantization = quantize_uint8(weights[0].astype(np.float32))
+            weights[0] = q * np.float32(quantization["scale"]) + np.float32(quantization["min"])
+            layer.set_weights(weights)
+    return copy
+
+
+def export_to_tfjs(model, output_dir, quantize=True):
+    """Manual export to TF.js layers-model format (Keras 2 compatible).
+
+    With quantize=True, Conv2D/Dense kernels are stored as uint8 (4x smaller);
+    biases and BatchNorm parameters stay float32.
+    """
     import json
 
     # Keras 2-style topology that TF.js understands
@@ -722,9 +810,14 @@ def export_to_tfjs(model, output_dir):
             # weight_vars[i].name is e.g. "conv1/kernel:0" — strip layer prefix and ":0"
             var_name = weight_vars[i].name.split('/')[-1].replace(':0', '')
             full_name = f"{layer.name}/{var_name}"
-            weight_entries.append(
-                {"name": full_name, "shape": list(w.shape), "dtype": "float32"}
-            )
+            entry = {"name": full_name, "shape": list(w.shape), "dtype": "float32"}
+            if (
+                quantize
+                and var_name == "kernel"
+                and isinstance(layer, (keras.layers.Conv2D, keras.layers.Dense))
+            ):
+                w, entry["quantization"] = quantize_uint8(w)
+            weight_entries.append(entry)
             weights_data.extend(w.tobytes())
 
     weights_filename = "group1-shard1of1.bin"
@@ -748,65 +841,117 @@ def export_to_tfjs(model, output_dir):
 # ─── Training ────────────────────────────────────────────────────────────────
 
 
+def dataset_accuracy(model, dataset):
+    """Top-1 accuracy of a (possibly uncompiled) model over a batched dataset."""
+    correct = total = 0
+    for images, labels in dataset:
+        pred = model(images, training=False).numpy().argmax(axis=1)
+        correct += int((pred == labels.numpy()).sum())
+        total += len(pred)
+    return correct / total
+
+
+def scale_pixels(images, labels):
+    """Cast a uint8 image batch to the float32 [0, 1] input the model (and frontend) use."""
+    return tf.cast(images, tf.float32) / 255.0, labels
+
+
 def train():
     print("=" * 60)
     print("CNN Shape Recognizer - Training")
     print("=" * 60)
     print(f"Devices: {[d.name for d in tf.config.list_physical_devices()]}")
 
-    # 1. Generate data
-    images, labels = generate_dataset()
-
-    # 2. Split
-    X_train, X_val, y_train, y_val = train_test_split(
-        images, labels, test_size=0.1, random_state=42, stratify=labels
+    # Half-precision compute on GPU (float32 variables); compile() adds loss scaling
+    if tf.config.list_physical_devices("GPU"):
+        keras.mixed_precision.set_global_policy("mixed_float16")
+        print("Mixed precision: mixed_float16")
+
+    # Synchronous data-parallel training across all local GPUs (one replica otherwise).
+    # Batch size and learning rate scale linearly with the number of replicas.
+    strategy = tf.distribute.MirroredStrategy()
+    replicas = strategy.num_replicas_in_sync
+    global_batch_size = BATCH_SIZE * replicas
+    print(f"Replicas: {replicas} (global batch size {global_batch_size})")
+
+    # 1. Validation data: a fixed set, generated once and cached
+    X_val, y_val = generate_dataset(VAL_SAMPLES_PER_CLASS)
+
+    # 2. Training data: augmented on the fly by worker processes while the device trains,
+    #    so every epoch sees fresh samples and nothing but the current batches sits in RAM
+    train_size = SAMPLES_PER_CLASS * NUM_CLASSES
+    steps_per_epoch = train_size // global_batch_size
+    print(f"\nTrain: {train_size}/epoch (generated online) | Validation: {len(X_val)}")
+
+    # Batch and prefetch on the host so the next batch is ready while the
+    # current step runs on the device
+    val_ds = (
+        tf.data.Dataset.from_tensor_slices((X_val, y_val))
+        .batch(global_batch_size)
+        .map(scale_pixels, num_parallel_calls=tf.data.AUTOTUNE)
+        .prefetch(tf.data.AUTOTUNE)
     )
-    print(f"\nTrain: {len(X_train)} | Validation: {len(X_val)}")
 
     # 3. Create model
-    model = create_model()
+    with strategy.scope():
+        model = create_model(learning_rate=LEARNING_RATE * replicas)
     model.summary()
     total_params = model.count_params()
     print(f"\nModel size: ~{total_params * 4 / 1024:.0f} KB")
 
     # 4. Callbacks
+    # EarlyStopping tracks the best weights in memory, so nothing is written to disk per epoch
+    early_stopping = keras.callbacks.EarlyStopping(
+        monitor="val_accuracy", patience=15, restore_best_weights=True, verbose=1
+    )
     callbacks = [
         keras.callbacks.ReduceLROnPlateau(
             monitor="val_loss", factor=0.3, patience=5, min_lr=1e-5, verbose=1
         ),
-        keras.callbacks.EarlyStopping(
-            monitor="val_accuracy", patience=15, restore_best_weights=True, verbose=1
-        ),
-        keras.callbacks.ModelCheckpoint(
-            os.path.join(os.path.dirname(__file__), "best_model.keras"),
-            monitor="val_accuracy",
-            save_best_only=True,
-            verbose=1,
-        ),
+        early_stopping,
     ]
 
     # 5. Train
     print(f"\nTraining for up to {MAX_EPOCHS} epochs...")
-    history = model.fit(
-        X_train,
-        y_train,
-        epochs=MAX_EPOCHS,
-        batch_size=BATCH_SIZE,
-        validation_data=(X_val, y_val),
-        callbacks=callbacks,
-    )
+    # Generation now overlaps training, so leave some cores to TensorFlow's own thread pools
+    workers = max(1, multiprocessing.cpu_count() - TF_RESERVED_CORES)
+    with multiprocessing.Pool(processes=workers, initializer=_init_worker) as pool:
+        train_ds = (
+            tf.data.Dataset.from_generator(
+                lambda: stream_samples(pool, train_size),
+                output_signature=(
+                    tf.TensorSpec((CANVAS_SIZE, CANVAS_SIZE, 1), tf.uint8),
+                    tf.TensorSpec((), tf.int64),
+                ),
+            )
+            .batch(global_batch_size)
+            .map(scale_pixels, num_parallel_calls=tf.data.AUTOTUNE)
+            .prefetch(tf.data.AUTOTUNE)
+        )
+        history = model.fit(
+            train_ds,
+            epochs=MAX_EPOCHS,
+            steps_per_epoch=steps_per_epoch,
+            validation_data=val_ds,
+            callbacks=callbacks,
+        )
+    # Keras 2 only restores the best weights when early stopping fires, not when
+    # training runs all MAX_EPOCHS — restore them explicitly before saving
+    if early_stopping.best_weights is not None:
+        model.set_weights(early_stopping.best_weights)
+    model.save(os.path.join(os.path.dirname(__file__), "best_model.keras"))
 
     # 6. Evaluate
     print("\n" + "=" * 60)
     print("Evaluation")
     print("=" * 60)
 
-    val_loss, val_acc = model.evaluate(X_val, y_val, verbose=0)
+    val_loss, val_acc = model.evaluate(val_ds, verbose=0)
     print(f"Validation loss: {val_loss:.4f}")
     print(f"Validation accuracy: {val_acc * 100:.2f}%")
 
     # Per-class accuracy
-    y_pred = model.predict(X_val, verbose=0).argmax(axis=1)
+    y_pred = model.predict(val_ds, verbose=0).argmax(axis=1)
     print("\nPer-class results:")
     print(classification_report(y_val, y_pred, target_names=SHAPE_NAMES))
 
@@ -817,15 +962,17 @@ def train():
 
     # 7. Inference speed
     print("\nInference speed test...")
-    dummy = np.random.randn(1, CANVAS_SIZE, CANVAS_SIZE, 1).astype(np.float32)
-    model.predict(dummy, verbose=0)  # warmup
+    # Time a compiled forward pass, not model.predict()'s per-call setup overhead
+    infer = tf.function(lambda x: model(x, training=False), jit_compile=xla_available())
+    dummy = tf.constant(np.random.randn(1, CANVAS_SIZE, CANVAS_SIZE, 1).astype(np.float32))
+    infer(dummy).numpy()  # warmup + trace
 
     import time
 
     times = []
     for _ in range(100):
         start = time.perf_counter()
-        model.predict(dummy, verbose=0)
+        infer(dummy).numpy()  # .numpy() waits for the device to finish
         times.append((time.perf_counter() - start) * 1000)
     print(f"Average inference: {np.mean(times):.2f}ms (std: {np.std(times):.2f}ms)")
 
@@ -833,7 +980,26 @@ def train():
     print(f"\nExporting to TF.js format at: {EXPORT_PATH}")
     os.makedirs(EXPORT_PATH, exist_ok=True)
 
-    export_to_tfjs(model, EXPORT_PATH)
+    # Check that the BN-folded graph still predicts what was evaluated above
+    export_model = fold_batch_norm(model)
+    x_batch, _ = next(iter(val_ds))
+    fold_error = np.abs(
+        export_model(x_batch, training=False).numpy() - model(x_batch, training=False).numpy()
+    ).max()
+    print(f"BatchNorm folding: max probability difference {fold_error:.2e}")
+    if fold_error > FOLD_TOLERANCE:
+        print("  Folded model diverges from the trained model — exporting it unfolded")
+        export_model = model
+
+    # Check the accuracy the browser will actually get with uint8 kernels
+    float_acc = dataset_accuracy(export_model, val_ds)
+    quant_acc = dataset_accuracy(dequantized_copy(export_model), val_ds)
+    print(f"Export accuracy: float32 {float_acc * 100:.2f}% | uint8 kernels {quant_acc * 100:.2f}%")
+    quantize = float_acc - quant_acc <= QUANTIZATION_MAX_DROP
+    if not quantize:
+        print("  uint8 kernels cost too much accuracy — exporting float32 weights")
+
+    export_to_tfjs(export_model, EXPORT_PATH, quantize=quantize)
 
     # Check exported file sizes
     total_size = 0